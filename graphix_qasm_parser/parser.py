@@ -2,337 +2,573 @@
 
 from __future__ import annotations
 
+import ast
+import functools
 import math
+import operator
+import re
+import sys
+from array import array
 from dataclasses import dataclass
-from typing import TYPE_CHECKING
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Union
 
 from antlr4 import (  # type: ignore[attr-defined]
+    BailErrorStrategy,
     CommonTokenStream,
-    FileStream,
+    IllegalStateException,
     InputStream,
     ParserRuleContext,
+    PredictionMode,
+    Token,
+    TokenStream,
 )
+from antlr4.error.ErrorListener import ConsoleErrorListener, ErrorListener
+from antlr4.error.Errors import ParseCancellationException, RecognitionException
+from antlr4.error.ErrorStrategy import DefaultErrorStrategy
 from graphix import Circuit
 from graphix.instruction import CCX, CNOT, RX, RY, RZ, RZZ, SWAP, H, S, X, Y, Z
-from openqasm_parser import qasm3Lexer, qasm3Parser, qasm3ParserVisitor
+from openqasm_parser import qasm3Lexer, qasm3Parser
+from openqasm_parser.qasm3ParserListener import qasm3ParserListener
 
 # override introduced in Python 3.12
-from typing_extensions import override
+from typing_extensions import TypeAlias, override
 
 if TYPE_CHECKING:
-    from pathlib import Path
+    from collections.abc import Callable
 
+    from antlr4.Recognizer import Recognizer
     from graphix.instruction import Instruction
 
 
 class OpenQASMParser:
     """Graphix OpenQASM parser."""
 
+    unbuffered_threshold: int
+
+    def __init__(self, unbuffered_threshold: int = 1 << 20) -> None:
+        """
+        Initialize the parser.
+
+        `parse_file` parses files larger than `unbuffered_threshold` bytes
+        (1 MiB by default) with `parse_stream_unbuffered`.
+        """
+        self.unbuffered_threshold = unbuffered_threshold
+
     def parse_stream(self, stream: InputStream) -> Circuit:
         """Parse the OpenQASM circuit described in the given stream."""
-        lexer = qasm3Lexer(stream)
-        tokens = CommonTokenStream(lexer)
-        parser = qasm3Parser(tokens)
-        tree = parser.program()  # type: ignore[no-untyped-call]
-        visitor = _CircuitVisitor(self)
-        tree.accept(visitor)
-        return Circuit(visitor.width, instr=visitor.instructions)
+        return _parse(stream, buffered=True)
+
+    def parse_stream_unbuffered(self, stream: InputStream) -> Circuit:
+        """
+        Parse the OpenQASM circuit described in the given stream.
+
+        Contrary to `parse_stream`, tokens are not kept until the end of
+        parsing but discarded as soon as the parser has consumed them, so
+        that memory use does not grow with the number of tokens.
+        """
+        return _parse(stream, buffered=False)
 
     def parse_str(self, s: str) -> Circuit:
         """Parse the OpenQASM circuit described in the given string."""
+        circuit = _try_fast_parse(s)
+        if circuit is not None:
+            return circuit
         stream = InputStream(s)
         return self.parse_stream(stream)
 
     def parse_file(self, path: Path | str) -> Circuit:
         """Parse the OpenQASM circuit described in the given file."""
-        stream = FileStream(str(path))
+        unbuffered = Path(path).stat().st_size > self.unbuffered_threshold
+        stream = _FileStream(path)
+        if unbuffered:
+            return self.parse_stream_unbuffered(stream)
         return self.parse_stream(stream)
 
 
-@dataclass
-class _Value:
-    ctx: ParserRuleContext | str  # type: ignore[valid-type]
+def _parse(stream: InputStream, *, buffered: bool) -> Circuit:
+    # Lexer and parser are cheap to create: the deserialized ATN and the
+    # DFA cache are class attributes shared by all instances, so there
+    # is no need to reuse them between calls.
+    lexer = qasm3Lexer(stream)
+    lexer_errors = _DeferredErrorListener()
+    if buffered:
+        parser = qasm3Parser(CommonTokenStream(lexer))
+    else:
+        # The input is lexed again if the first stage bails out (see
+        # below): lexer errors are only reported if this lexer is the
+        # only one, so that they are not reported twice.
+        lexer.removeErrorListeners()
+        lexer.addErrorListener(lexer_errors)
+        parser = qasm3Parser(_UnbufferedTokenStream(lexer))
+    # Two-stage parsing: the input is first parsed with the faster SLL
+    # prediction mode, bailing out on the first syntax error, which is
+    # either an actual error or a limitation of SLL. In that case, the
+    # input is parsed again with full LL prediction, which reports
+    # syntax errors as usual.
+    parser._interp.predictionMode = PredictionMode.SLL  # type: ignore[attr-defined]  # noqa: SLF001
+    parser._errHandler = BailErrorStrategy()  # type: ignore[no-untyped-call]  # noqa: SLF001
+    parser.removeErrorListeners()
+    try:
+        listener = _parse_program(parser)
+    except ParseCancellationException:
+        if buffered:
+            # The parser is reset to parse the buffered tokens again.
+            # `Parser.reset` fails if parse listeners are registered.
+            parser.removeParseListeners()
+            parser.reset()
+            parser._interp.predictionMode = PredictionMode.LL  # type: ignore[attr-defined]  # noqa: SLF001
+            parser._errHandler = DefaultErrorStrategy()  # type: ignore[no-untyped-call]  # noqa: SLF001
+            parser.addErrorListener(ConsoleErrorListener.INSTANCE)
+        else:
+            # Unbuffered token streams cannot be rewound: the input is
+            # lexed again by a new lexer, which reports lexer errors.
+            lexer_errors.errors.clear()
+            stream.seek(0)
+            parser = qasm3Parser(_UnbufferedTokenStream(qasm3Lexer(stream)))
+        listener = _parse_program(parser)
+    finally:
+        lexer_errors.report()
+    return Circuit(listener.width, instr=listener.instructions)
 
-    def __neg__(self) -> _Value:
-        return NotImplemented  # type: ignore[no-any-return]
 
-    def __add__(self, other: object) -> _Value:
-        return NotImplemented
+def _parse_program(parser: qasm3Parser) -> _CircuitListener:
+    # Instructions are emitted from the parse listener callbacks while
+    # parsing, so that the parse tree is not traversed a second time.
+    # Parse trees are still built: without them, sub-rule contexts are
+    # not attached to their parent and the callbacks could not access
+    # operands and expressions.
+    listener = _CircuitListener()
+    parser.addParseListener(listener)
+    parser.program()  # type: ignore[no-untyped-call]
+    return listener
 
-    def __radd__(self, other: object) -> _Value:
-        return NotImplemented
 
-    def __sub__(self, other: object) -> _Value:
-        return NotImplemented
+class _DeferredErrorListener(ErrorListener):
+    """Error listener that records errors until `report` prints them."""
 
-    def __rsub__(self, other: object) -> _Value:
-        return NotImplemented
+    errors: list[tuple[Recognizer, Token | None, int, int, str, RecognitionException | None]]
 
-    def __mul__(self, other: object) -> _Value:
-        return NotImplemented
+    def __init__(self) -> None:
+        self.errors = []
 
-    def __rmul__(self, other: object) -> _Value:
-        return NotImplemented
+    @override
+    def syntaxError(
+        self,
+        recognizer: Recognizer,
+        offendingSymbol: Token | None,
+        line: int,
+        column: int,
+        msg: str,
+        e: RecognitionException | None,
+    ) -> None:
+        self.errors.append((recognizer, offendingSymbol, line, column, msg, e))
 
-    def __truediv__(self, other: object) -> _Value:
-        return NotImplemented
+    def report(self) -> None:
+        """Print the recorded errors as the default error listener does."""
+        for error in self.errors:
+            # `INSTANCE` is declared as `None` and set after the class definition
+            ConsoleErrorListener.INSTANCE.syntaxError(*error)  # type: ignore[attr-defined]
+        self.errors.clear()
 
-    def __rtruediv__(self, other: object) -> _Value:
-        return NotImplemented
 
-    def __mod__(self, other: object) -> _Value:
-        return NotImplemented
+class _FileStream(InputStream):
+    """
+    Input stream for a UTF-8 encoded file.
 
-    def __rmod__(self, other: object) -> _Value:
-        return NotImplemented
+    `antlr4.FileStream` stores the code points of the file in a list of
+    Python integers: this class stores them in a compact byte string or
+    array instead, since the lexer only needs to index them.
+    """
 
-    def __int__(self) -> int:
-        msg = "Not an integer value: {ctx.getText() if isinstance(ctx, ParserRuleContext) else ctx}"
-        raise TypeError(msg)
+    __slots__ = ()
 
-    def __float__(self) -> float:
-        msg = "Not a floating-point value: {ctx.getText() if isinstance(ctx, ParserRuleContext) else ctx}"
-        raise TypeError(msg)
+    def __init__(self, path: Path | str) -> None:
+        with Path(path).open("rb") as file:
+            contents = file.read()
+        super().__init__(contents.decode("utf-8"))
+        self.name = str(path)
+
+    @override
+    def _loadString(self) -> None:
+        self._index = 0
+        if self.strdata.isascii():
+            self.data = self.strdata.encode("ascii")  # type: ignore[assignment]
+        else:
+            self.data = array("I", map(ord, self.strdata))  # type: ignore[assignment]
+        self._size = len(self.data)
+
+
+class _UnbufferedTokenStream(TokenStream):
+    """
+    Token stream that only buffers the tokens that the parser may look at.
+
+    The Python ANTLR runtime has no equivalent of the Java runtime's
+    `UnbufferedTokenStream`: this class follows its implementation.
+    Tokens are buffered from the first mark taken by the parser (for
+    adaptive prediction) or from the current token if there is no mark.
+    Only tokens of the default channel are kept, as in `CommonTokenStream`.
+    """
+
+    tokenSource: qasm3Lexer  # noqa: N815
+    tokens: list[Token]
+    # Index in `tokens` of the current token
+    p: int
+    num_markers: int
+    last_token: Token | None
+    # Value of `last_token` for the first token in `tokens`
+    last_token_buffer_start: Token | None
+    current_token_index: int
+
+    def __init__(self, token_source: qasm3Lexer) -> None:
+        self.tokenSource = token_source
+        self.tokens = []
+        self.p = 0
+        self.num_markers = 0
+        self.last_token = None
+        self.last_token_buffer_start = None
+        self.current_token_index = 0
+        self.fill(1)
+
+    @property
+    def index(self) -> int:
+        return self.current_token_index
+
+    def get(self, i: int) -> Token:
+        buffer_start_index = self.get_buffer_start_index()
+        if i < buffer_start_index or i >= buffer_start_index + len(self.tokens):
+            msg = f"get({i}) outside buffer: {buffer_start_index}..{buffer_start_index + len(self.tokens)}"
+            raise IndexError(msg)
+        return self.tokens[i - buffer_start_index]
+
+    def LT(self, i: int) -> Token | None:  # noqa: N802
+        if i == -1:
+            return self.last_token
+        self.sync(i)
+        index = self.p + i - 1
+        if index < 0:
+            msg = f"LT({i}) gives negative index"
+            raise IndexError(msg)
+        if index >= len(self.tokens):
+            # EOF is repeated after the end of the input
+            return self.tokens[-1]
+        return self.tokens[index]
+
+    def LA(self, i: int) -> int:  # noqa: N802
+        token = self.LT(i)
+        if token is None:
+            return Token.INVALID_TYPE
+        return token.type  # type: ignore[return-value]
+
+    def getTokenSource(self) -> qasm3Lexer:  # noqa: N802
+        return self.tokenSource
+
+    def getText(self, start: Token | int, stop: Token | int) -> str:  # noqa: N802
+        start_index: int = start.tokenIndex if isinstance(start, Token) else start  # type: ignore[assignment]
+        stop_index: int = stop.tokenIndex if isinstance(stop, Token) else stop  # type: ignore[assignment]
+        buffer_start_index = self.get_buffer_start_index()
+        first = max(start_index - buffer_start_index, 0)
+        last = min(stop_index - buffer_start_index, len(self.tokens) - 1)
+        return "".join(token.text for token in self.tokens[first : last + 1] if token.type != Token.EOF)
+
+    def consume(self) -> None:
+        if self.LA(1) == Token.EOF:
+            msg = "cannot consume EOF"
+            raise IllegalStateException(msg)
+        self.last_token = self.tokens[self.p]
+        if self.p == len(self.tokens) - 1 and self.num_markers == 0:
+            # No mark: the buffer can be emptied
+            self.tokens = []
+            self.p = -1
+            self.last_token_buffer_start = self.last_token
+        self.p += 1
+        self.current_token_index += 1
+        self.sync(1)
+
+    def sync(self, want: int) -> None:
+        """Make sure that tokens up to `p + want - 1` are in the buffer."""
+        need = self.p + want - len(self.tokens)
+        if need > 0:
+            self.fill(need)
+
+    def fill(self, n: int) -> None:
+        """Add `n` tokens to the buffer, unless EOF is reached before."""
+        while n > 0:
+            if self.tokens and self.tokens[-1].type == Token.EOF:
+                return
+            token = self.tokenSource.nextToken()
+            if token.channel == Token.DEFAULT_CHANNEL:
+                token.tokenIndex = self.get_buffer_start_index() + len(self.tokens)
+                self.tokens.append(token)
+                n -= 1
+
+    def mark(self) -> int:
+        if self.num_markers == 0:
+            self.last_token_buffer_start = self.last_token
+        self.num_markers += 1
+        return -self.num_markers
+
+    def release(self, marker: int) -> None:
+        if marker != -self.num_markers:
+            msg = "release() called with an invalid marker"
+            raise IllegalStateException(msg)
+        self.num_markers -= 1
+        if self.num_markers == 0:
+            # Drop the tokens before the current one
+            if self.p > 0:
+                del self.tokens[: self.p]
+                self.p = 0
+            self.last_token_buffer_start = self.last_token
+
+    def seek(self, index: int) -> None:
+        if index == self.current_token_index:
+            return
+        if index > self.current_token_index:
+            self.sync(index - self.current_token_index)
+            index = min(index, self.get_buffer_start_index() + len(self.tokens) - 1)
+        i = index - self.get_buffer_start_index()
+        if i < 0:
+            msg = f"cannot seek to negative index {index}"
+            raise ValueError(msg)
+        if i >= len(self.tokens):
+            msg = f"seek to index outside buffer: {index}"
+            raise IndexError(msg)
+        self.p = i
+        self.current_token_index = index
+        if self.p == 0:
+            self.last_token = self.last_token_buffer_start
+        else:
+            self.last_token = self.tokens[self.p - 1]
+
+    def get_buffer_start_index(self) -> int:
+        return self.current_token_index - self.p
 
 
 @dataclass
-class _Int(_Value):
-    value: int
+class _Bit:
+    # dataclass(slots=True) requires Python 3.10
+    __slots__ = ("index",)
 
-    @override
-    def __neg__(self) -> _Value:
-        return _Int(self.ctx, -self.value)
+    index: int
 
-    @override
-    def __add__(self, other: object) -> _Value:
-        if isinstance(other, _Int):
-            return _Int(self.ctx, self.value + other.value)
-        return NotImplemented
 
-    @override
-    def __sub__(self, other: object) -> _Value:
-        if isinstance(other, _Int):
-            return _Int(self.ctx, self.value - other.value)
-        return NotImplemented
+@dataclass
+class _Qubit:
+    __slots__ = ("index",)
 
-    @override
-    def __mul__(self, other: object) -> _Value:
-        if isinstance(other, _Int):
-            return _Int(self.ctx, self.value * other.value)
-        return NotImplemented
+    index: int
 
-    @override
-    def __truediv__(self, other: object) -> _Value:
-        if isinstance(other, _Int):
-            result = self.value / other.value
-            if isinstance(result, int):
-                return _Int(self.ctx, result)
-            return _Float(self.ctx, result)
-        return NotImplemented
 
-    @override
-    def __mod__(self, other: object) -> _Value:
-        if isinstance(other, _Int):
-            return _Int(self.ctx, self.value % other.value)
-        return NotImplemented
+@dataclass
+class _Array:
+    __slots__ = ("values",)
 
-    @override
-    def __int__(self) -> int:
-        return self.value
+    values: tuple[_Bit | _Qubit, ...]
 
-    @override
-    def __float__(self) -> float:
-        return float(self.value)
 
+# Values bound in the environment: numeric constants are plain Python
+# numbers, registers are described by the dataclasses above.
+_Value: TypeAlias = Union[int, float, _Bit, _Qubit, _Array]
 
-@dataclass
-class _Float(_Value):
-    value: float
 
-    @override
-    def __neg__(self) -> _Value:
-        return _Float(self.ctx, -self.value)
+def _identifier(ctx: ParserRuleContext) -> str:  # type: ignore[valid-type]
+    """Return the identifier of `ctx`, interned to share it between references."""
+    return sys.intern(ctx.Identifier().getText())  # type: ignore[attr-defined]
 
-    @override
-    def __add__(self, other: object) -> _Value:
-        if isinstance(other, (_Int, _Float)):
-            return _Float(self.ctx, self.value + other.value)
-        return NotImplemented
 
-    @override
-    def __radd__(self, other: object) -> _Value:
-        if isinstance(other, _Int):
-            return _Float(self.ctx, other.value + self.value)
-        return NotImplemented
+def _token_type(ctx: ParserRuleContext, i: int) -> int:  # type: ignore[valid-type]
+    """Return the type of the token that is the `i`-th child of `ctx`."""
+    return ctx.getChild(i).symbol.type  # type: ignore[attr-defined, no-any-return]
 
-    @override
-    def __sub__(self, other: object) -> _Value:
-        if isinstance(other, (_Int, _Float)):
-            return _Float(self.ctx, self.value - other.value)
-        return NotImplemented
 
-    @override
-    def __rsub__(self, other: object) -> _Value:
-        if isinstance(other, _Int):
-            return _Float(self.ctx, other.value - self.value)
-        return NotImplemented
+_UNARY_OPERATORS: dict[int, Callable[[Any], _Value]] = {
+    qasm3Parser.MINUS: operator.neg,
+}
 
-    @override
-    def __mul__(self, other: object) -> _Value:
-        if isinstance(other, (_Int, _Float)):
-            return _Float(self.ctx, self.value * other.value)
-        return NotImplemented
+_BINARY_OPERATORS: dict[int, Callable[[Any, Any], _Value]] = {
+    qasm3Parser.ASTERISK: operator.mul,
+    qasm3Parser.SLASH: operator.truediv,
+    qasm3Parser.PERCENT: operator.mod,
+    qasm3Parser.PLUS: operator.add,
+    qasm3Parser.MINUS: operator.sub,
+}
 
-    @override
-    def __rmul__(self, other: object) -> _Value:
-        if isinstance(other, _Int):
-            return _Float(self.ctx, other.value * self.value)
-        return NotImplemented
 
-    @override
-    def __truediv__(self, other: object) -> _Value:
-        if isinstance(other, (_Int, _Float)):
-            return _Float(self.ctx, self.value / other.value)
-        return NotImplemented
+# https://openqasm.com/language/standard_library.html#ccx
+def _build_ccx(operands: list[int], _exprs: list[float]) -> Instruction:
+    return CCX(target=operands[2], controls=(operands[0], operands[1]))
 
-    @override
-    def __rtruediv__(self, other: object) -> _Value:
-        if isinstance(other, _Int):
-            return _Float(self.ctx, other.value / self.value)
-        return NotImplemented
 
-    @override
-    def __mod__(self, other: object) -> _Value:
-        if isinstance(other, _Float):
-            return _Float(self.ctx, self.value % other.value)
-        return NotImplemented
+# https://openqasm.com/language/standard_library.html#crz
+def _build_crz(operands: list[int], exprs: list[float]) -> Instruction:
+    return RZZ(target=operands[1], control=operands[0], angle=exprs[0])
 
-    @override
-    def __rmod__(self, other: object) -> _Value:
-        if isinstance(other, _Float):
-            return _Float(self.ctx, other.value % self.value)
-        return NotImplemented
 
-    @override
-    def __float__(self) -> float:
-        return self.value
+# https://openqasm.com/language/standard_library.html#cx
+def _build_cx(operands: list[int], _exprs: list[float]) -> Instruction:
+    return CNOT(target=operands[1], control=operands[0])
 
 
-@dataclass
-class _Bit(_Value):
-    index: int
+# https://openqasm.com/language/standard_library.html#swap
+def _build_swap(operands: list[int], _exprs: list[float]) -> Instruction:
+    return SWAP(targets=(operands[0], operands[1]))
 
 
-@dataclass
-class _Qubit(_Value):
-    index: int
+# https://openqasm.com/language/standard_library.html#h
+def _build_h(operands: list[int], _exprs: list[float]) -> Instruction:
+    return H(target=operands[0])
 
 
-@dataclass
-class _Array(_Value):
-    values: list[_Value]
+# https://openqasm.com/language/standard_library.html#s
+def _build_s(operands: list[int], _exprs: list[float]) -> Instruction:
+    return S(target=operands[0])
+
 
+# https://openqasm.com/language/standard_library.html#x
+def _build_x(operands: list[int], _exprs: list[float]) -> Instruction:
+    return X(target=operands[0])
 
-class _CircuitVisitor(qasm3ParserVisitor):
-    parser: OpenQASMParser
+
+# https://openqasm.com/language/standard_library.html#y
+def _build_y(operands: list[int], _exprs: list[float]) -> Instruction:
+    return Y(target=operands[0])
+
+
+# https://openqasm.com/language/standard_library.html#z
+def _build_z(operands: list[int], _exprs: list[float]) -> Instruction:
+    return Z(target=operands[0])
+
+
+# https://openqasm.com/language/standard_library.html#rx
+def _build_rx(operands: list[int], exprs: list[float]) -> Instruction:
+    return RX(target=operands[0], angle=exprs[0])
+
+
+# https://openqasm.com/language/standard_library.html#ry
+def _build_ry(operands: list[int], exprs: list[float]) -> Instruction:
+    return RY(target=operands[0], angle=exprs[0])
+
+
+# https://openqasm.com/language/standard_library.html#rz
+def _build_rz(operands: list[int], exprs: list[float]) -> Instruction:
+    return RZ(target=operands[0], angle=exprs[0])
+
+
+# Gate name -> number of qubit operands, number of parameters, and
+# function building the instruction from the operands and the parameter
+# values. The numbers are checked by `_build_instruction`, so that the
+# builders can index their arguments directly.
+_GATE_BUILDERS: dict[str, tuple[int, int, Callable[[list[int], list[float]], Instruction]]] = {
+    "ccx": (3, 0, _build_ccx),
+    "crz": (2, 1, _build_crz),
+    "cx": (2, 0, _build_cx),
+    "swap": (2, 0, _build_swap),
+    "h": (1, 0, _build_h),
+    "s": (1, 0, _build_s),
+    "x": (1, 0, _build_x),
+    "y": (1, 0, _build_y),
+    "z": (1, 0, _build_z),
+    "rx": (1, 1, _build_rx),
+    "ry": (1, 1, _build_ry),
+    "rz": (1, 1, _build_rz),
+}
+
+
+def _build_instruction(gate: str, operands: list[int], exprs: list[float]) -> Instruction | None:
+    """Build the instruction for a call to `gate`, or return `None` if the gate is unknown."""
+    entry = _GATE_BUILDERS.get(gate)
+    if entry is None:
+        return None
+    operand_count, parameter_count, builder = entry
+    if len(operands) != operand_count:
+        msg = f"Gate {gate} expects {operand_count} operands, got {len(operands)}"
+        raise ValueError(msg)
+    if len(exprs) != parameter_count:
+        msg = f"Gate {gate} expects {parameter_count} parameters, got {len(exprs)}"
+        raise ValueError(msg)
+    return builder(operands, exprs)
+
+
+class _CircuitListener(qasm3ParserListener):
     width: int
     instructions: list[Instruction]
+    append_instruction: Callable[[Instruction], None]
     env: dict[str, _Value]
 
-    def __init__(self, parser: OpenQASMParser) -> None:
-        self.parser = parser
+    def __init__(self) -> None:
         self.width = 0
         self.instructions = []
+        # Bound once, rather than on every gate call
+        self.append_instruction = self.instructions.append
         self.env = {
-            "pi": _Float("pi", math.pi),
-            "π": _Float("π", math.pi),
+            "pi": math.pi,
+            "π": math.pi,
         }
 
     @override
-    def visitOldStyleDeclarationStatement(self, ctx: qasm3Parser.OldStyleDeclarationStatementContext) -> None:
+    def exitStatementOrScope(self, ctx: qasm3Parser.StatementOrScopeContext) -> None:
+        # The statement has been processed by the callbacks of its
+        # sub-rules and the circuit only needs `width` and `instructions`:
+        # detach the statement from its parent (it is the last child, just
+        # added), so that the parse tree does not grow with the input.
+        ctx.parentCtx.removeLastChild()
+
+    @override
+    def exitOldStyleDeclarationStatement(self, ctx: qasm3Parser.OldStyleDeclarationStatementContext) -> None:
+        # Exit callbacks are also called on statements that are only
+        # partly parsed because of a syntax error (in particular, on every
+        # statement being parsed when the SLL stage bails out): they are
+        # skipped, since their children may be missing.
+        if ctx.exception is not None:
+            return
         decl_class: type[_Bit | _Qubit]
-        kind = ctx.getChild(0)
-        if kind.symbol.type == qasm3Parser.QREG:
+        kind = _token_type(ctx, 0)
+        if kind == qasm3Parser.QREG:
             decl_class = _Qubit
-        elif kind.symbol.type == qasm3Parser.CREG:
+        elif kind == qasm3Parser.CREG:
             decl_class = _Bit
         else:
-            msg = f"Unknown declaration statement kind: {kind}"
+            msg = f"Unknown declaration statement kind: {ctx.getChild(0).getText()}"
             raise NotImplementedError(msg)
-        identifier = ctx.Identifier().getText()  # type: ignore[no-untyped-call]
+        identifier = _identifier(ctx)
         designator = ctx.designator()  # type: ignore[no-untyped-call]
-        self.declare_registers(ctx, decl_class, identifier, designator)
+        self.declare_registers(decl_class, identifier, designator)
 
     @override
-    def visitQuantumDeclarationStatement(self, ctx: qasm3Parser.QuantumDeclarationStatementContext) -> None:
+    def exitQuantumDeclarationStatement(self, ctx: qasm3Parser.QuantumDeclarationStatementContext) -> None:
+        if ctx.exception is not None:
+            return
         designator = ctx.qubitType().designator()  # type: ignore[no-untyped-call]
-        identifier = ctx.Identifier().getText()  # type: ignore[no-untyped-call]
-        self.declare_registers(ctx, _Qubit, identifier, designator)
+        identifier = _identifier(ctx)
+        self.declare_registers(_Qubit, identifier, designator)
 
     @override
-    def visitConstDeclarationStatement(self, ctx: qasm3Parser.ConstDeclarationStatementContext) -> None:
-        identifier = ctx.Identifier().getText()  # type: ignore[no-untyped-call]
-        value = ctx.declarationExpression()  # type: ignore[no-untyped-call]
-        expr = self.evaluate_expression(value)
-        self.env[identifier] = expr
+    def exitConstDeclarationStatement(self, ctx: qasm3Parser.ConstDeclarationStatementContext) -> None:
+        if ctx.exception is not None:
+            return
+        identifier = _identifier(ctx)
+        value = ctx.declarationExpression().expression()  # type: ignore[no-untyped-call]
+        self.env[identifier] = self.evaluate_expression(value)
 
     @override
-    def visitGateCallStatement(self, ctx: qasm3Parser.GateCallStatementContext) -> None:  # noqa: C901, PLR0912
-        gate = ctx.Identifier().getText()  # type: ignore[no-untyped-call]
+    def exitGateCallStatement(self, ctx: qasm3Parser.GateCallStatementContext) -> None:
+        if ctx.exception is not None:
+            return
+        gate = _identifier(ctx)
         operand_list = ctx.gateOperandList()  # type: ignore[no-untyped-call]
-        operands = [
-            self.convert_qubit_index(operand_list.getChild(i)) for i in range(0, operand_list.getChildCount(), 2)
-        ]
+        operands = [self.convert_qubit_index(operand) for operand in operand_list.gateOperand()]
         if expr_list := ctx.expressionList():  # type: ignore[no-untyped-call]
-            exprs = [
-                float(self.evaluate_expression(expr_list.getChild(i))) for i in range(0, expr_list.getChildCount(), 2)
-            ]
+            exprs = [self.evaluate_expression_float(expr) for expr in expr_list.expression()]
         else:
             exprs = []
-        if gate == "ccx":
-            # https://openqasm.com/language/standard_library.html#ccx
-            instruction = CCX(target=operands[2], controls=(operands[0], operands[1]))
-        elif gate == "crz":
-            # https://openqasm.com/language/standard_library.html#crz
-            instruction = RZZ(target=operands[1], control=operands[0], angle=exprs[0])
-        elif gate == "cx":
-            # https://openqasm.com/language/standard_library.html#cx
-            instruction = CNOT(target=operands[1], control=operands[0])
-        elif gate == "swap":
-            # https://openqasm.com/language/standard_library.html#swap
-            instruction = SWAP(targets=(operands[0], operands[1]))
-        elif gate == "h":
-            # https://openqasm.com/language/standard_library.html#h
-            instruction = H(target=operands[0])
-        elif gate == "s":
-            # https://openqasm.com/language/standard_library.html#s
-            instruction = S(target=operands[0])
-        elif gate == "x":
-            # https://openqasm.com/language/standard_library.html#x
-            instruction = X(target=operands[0])
-        elif gate == "y":
-            # https://openqasm.com/language/standard_library.html#y
-            instruction = Y(target=operands[0])
-        elif gate == "z":
-            # https://openqasm.com/language/standard_library.html#z
-            instruction = Z(target=operands[0])
-        elif gate == "rx":
-            # https://openqasm.com/language/standard_library.html#rx
-            instruction = RX(target=operands[0], angle=exprs[0])
-        elif gate == "ry":
-            # https://openqasm.com/language/standard_library.html#ry
-            instruction = RY(target=operands[0], angle=exprs[0])
-        elif gate == "rz":
-            # https://openqasm.com/language/standard_library.html#rz
-            instruction = RZ(target=operands[0], angle=exprs[0])
-        else:
+        instruction = _build_instruction(gate, operands, exprs)
+        if instruction is None:
             msg = f"Unknown gate: {gate}"
             raise NotImplementedError(msg)
-        self.instructions.append(instruction)
+        self.append_instruction(instruction)
 
     def declare_registers(
         self,
-        ctx: ParserRuleContext,  # type: ignore[valid-type]
         decl_class: type[_Bit | _Qubit],
         identifier: str,
         designator: qasm3Parser.DesignatorContext | None,
@@ -340,11 +576,11 @@ class _CircuitVisitor(qasm3ParserVisitor):
         value: _Value
         if designator:
             expression = designator.expression()  # type: ignore[no-untyped-call]
-            count = int(self.evaluate_expression(expression))
-            value = _Array(ctx, [decl_class(ctx, self.width + i) for i in range(count)])
+            count = self.evaluate_expression_int(expression)
+            value = _Array(tuple(decl_class(self.width + i) for i in range(count)))
             self.width += count
         else:
-            value = decl_class(ctx, self.width)
+            value = decl_class(self.width)
             self.width += 1
         self.env[identifier] = value
 
@@ -358,103 +594,262 @@ class _CircuitVisitor(qasm3ParserVisitor):
     def evaluate_operand(self, operand: qasm3Parser.GateOperandContext) -> _Value:
         child = operand.getChild(0)
         if child.getRuleIndex() == qasm3Parser.RULE_indexedIdentifier:
-            identifier = child.Identifier().getText()
+            identifier = _identifier(child)
             value = self.env.get(identifier)
             if value is None:
                 msg = f"name {identifier} is not defined"
                 raise NameError(msg)
-            for operator in child.indexOperator():
+            for index_operator in child.indexOperator():
                 if not isinstance(value, _Array):
                     msg = f"Array expected: {identifier}"
                     raise TypeError(msg)
-                index = int(self.evaluate_expression(operator.expression(0)))
+                index = self.evaluate_expression_int(index_operator.expression(0))
                 if index < 0:
                     msg = f"Negative index: {identifier}"
                     raise IndexError(msg)
-                if index >= len(value.values):
-                    msg = f"Index out of bounds: {identifier} has length {len(value.values)}"
-                    raise IndexError(msg)
-                value = value.values[index]
+                values = value.values
+                # Upper bound is checked by tuple indexing
+                try:
+                    value = values[index]
+                except IndexError:
+                    msg = f"Index out of bounds: {identifier} has length {len(values)}"
+                    raise IndexError(msg) from None
             return value
         msg = f"Unknown operand: {operand}"
         raise NotImplementedError(msg)
 
-    def evaluate_expression(self, expr: qasm3Parser.ExpressionContext) -> _Value:
-        return _ExpressionVisitor(self).parse(expr)
-
-
-class _ExpressionVisitor(qasm3ParserVisitor):
-    circuit: _CircuitVisitor
-
-    def __init__(self, circuit: _CircuitVisitor) -> None:
-        self.circuit = circuit
-
-    def parse(self, expr: qasm3Parser.ExpressionContext) -> _Value:
-        value: _Value | None = expr.accept(self)
-        if value is None:
-            msg = f"Cannot parse value: {expr.getText()}"
-            raise NotImplementedError(msg)
-        return value
-
-    @override
-    def visitParenthesisExpression(self, ctx: qasm3Parser.ParenthesisExpressionContext) -> _Value:
-        expr: qasm3Parser.ExpressionContext = ctx.expression()  # type: ignore[no-untyped-call]
-        return self.parse(expr)
-
-    @override
-    def visitUnaryExpression(self, ctx: qasm3Parser.UnaryExpressionContext) -> _Value:
-        operand_expr: qasm3Parser.ExpressionContext = ctx.expression()  # type: ignore[no-untyped-call]
-        operand = self.parse(operand_expr)
-        operator = ctx.getChild(0).symbol.type
-        if operator == qasm3Parser.MINUS:
-            result = -operand
-            result.ctx = ctx
-            return result
-        msg = f"Unknown operator: {ctx.getChild(0).symbol.text}"
-        raise NotImplementedError(msg)
-
-    @override
-    def visitAdditiveExpression(self, ctx: qasm3Parser.AdditiveExpressionContext) -> _Value:
-        return self.parse_binary_operator(ctx)
+    def evaluate_expression_int(self, expr: qasm3Parser.ExpressionContext) -> int:
+        # Indices and sizes are usually integer literals: they are converted
+        # directly, without going through the general evaluation and the
+        # type check of its result.
+        if isinstance(expr, qasm3Parser.LiteralExpressionContext):
+            symbol = expr.getChild(0).symbol
+            if symbol.type == qasm3Parser.DecimalIntegerLiteral:
+                return int(symbol.text)
+        value = self.evaluate_expression(expr)
+        if isinstance(value, int):
+            return value
+        msg = f"Not an integer value: {expr.getText()}"
+        raise TypeError(msg)
 
-    @override
-    def visitMultiplicativeExpression(self, ctx: qasm3Parser.MultiplicativeExpressionContext) -> _Value:
-        return self.parse_binary_operator(ctx)
+    def evaluate_expression_float(self, expr: qasm3Parser.ExpressionContext) -> float:
+        value = self.evaluate_expression(expr)
+        # Integers are valid angles: they are not converted
+        if isinstance(value, (int, float)):
+            return value
+        msg = f"Not a floating-point value: {expr.getText()}"
+        raise TypeError(msg)
 
-    @override
-    def visitLiteralExpression(self, ctx: qasm3Parser.LiteralExpressionContext) -> _Value:
-        literal = ctx.getChild(0)
-        if literal.symbol.type == qasm3Parser.DecimalIntegerLiteral:
-            return _Int(ctx, int(literal.symbol.text))
-        if literal.symbol.type == qasm3Parser.FloatLiteral:
-            return _Float(ctx, float(literal.symbol.text))
-        if literal.symbol.type == qasm3Parser.Identifier:
-            identifier = literal.symbol.text
-            if value := self.circuit.env.get(identifier):
+    def evaluate_expression(self, expr: qasm3Parser.ExpressionContext) -> _Value:
+        # Most expressions are literals (indices, angles or constants):
+        # they are evaluated directly, without setting up the stacks.
+        if isinstance(expr, qasm3Parser.LiteralExpressionContext):
+            return self.evaluate_literal(expr)
+        # Post-order traversal with explicit stacks rather than recursion:
+        # `stack` holds the nodes to process, paired with a flag telling
+        # whether their operands have already been evaluated, and `values`
+        # holds the values of the evaluated operands.
+        stack: list[tuple[qasm3Parser.ExpressionContext, bool]] = [(expr, False)]
+        values: list[_Value] = []
+        while stack:
+            ctx, evaluated = stack.pop()
+            if isinstance(ctx, qasm3Parser.LiteralExpressionContext):
+                values.append(self.evaluate_literal(ctx))
+            elif isinstance(ctx, (qasm3Parser.AdditiveExpressionContext, qasm3Parser.MultiplicativeExpressionContext)):
+                if evaluated:
+                    rhs = values.pop()
+                    lhs = values.pop()
+                    values.append(self.apply_binary_operator(ctx, lhs, rhs))
+                else:
+                    stack.append((ctx, True))
+                    stack.append((ctx.expression(1), False))
+                    stack.append((ctx.expression(0), False))
+            elif isinstance(ctx, qasm3Parser.UnaryExpressionContext):
+                if evaluated:
+                    values.append(self.apply_unary_operator(ctx, values.pop()))
+                else:
+                    stack.append((ctx, True))
+                    stack.append((ctx.expression(), False))  # type: ignore[no-untyped-call]
+            elif isinstance(ctx, qasm3Parser.ParenthesisExpressionContext):
+                stack.append((ctx.expression(), False))  # type: ignore[no-untyped-call]
+            else:
+                msg = f"Cannot parse value: {ctx.getText()}"
+                raise NotImplementedError(msg)
+        return values.pop()
+
+    def evaluate_literal(self, ctx: qasm3Parser.LiteralExpressionContext) -> _Value:
+        symbol = ctx.getChild(0).symbol
+        token_type = symbol.type
+        if token_type == qasm3Parser.DecimalIntegerLiteral:
+            return int(symbol.text)
+        if token_type == qasm3Parser.FloatLiteral:
+            return float(symbol.text)
+        if token_type == qasm3Parser.Identifier:
+            # `pi` and `π` are bound to `math.pi` in the environment: like
+            # other constants, they are resolved with a single lookup.
+            identifier = sys.intern(symbol.text)
+            value = self.env.get(identifier)
+            if value is not None:
                 return value
-        msg = f"Unknown literal: {literal.symbol.text}"
+        msg = f"Unknown literal: {symbol.text}"
         raise NotImplementedError(msg)
 
-    def parse_binary_operator(
-        self, ctx: qasm3Parser.AdditiveExpressionContext | qasm3Parser.MultiplicativeExpressionContext
+    def apply_unary_operator(self, ctx: qasm3Parser.UnaryExpressionContext, operand: _Value) -> _Value:
+        function = _UNARY_OPERATORS.get(_token_type(ctx, 0))
+        if function is None:
+            msg = f"Unknown operator: {ctx.getChild(0).getText()}"
+            raise NotImplementedError(msg)
+        return function(operand)
+
+    def apply_binary_operator(
+        self,
+        ctx: qasm3Parser.AdditiveExpressionContext | qasm3Parser.MultiplicativeExpressionContext,
+        lhs: _Value,
+        rhs: _Value,
     ) -> _Value:
-        lhs_expr: qasm3Parser.ExpressionContext = ctx.getChild(0)
-        rhs_expr: qasm3Parser.ExpressionContext = ctx.getChild(2)
-        lhs = self.parse(lhs_expr)
-        rhs = self.parse(rhs_expr)
-        operator = ctx.getChild(1).symbol.type
-        if operator == qasm3Parser.ASTERISK:
-            result = lhs * rhs
-        elif operator == qasm3Parser.SLASH:
-            result = lhs / rhs
-        elif operator == qasm3Parser.PERCENT:
-            result = lhs % rhs
-        elif operator == qasm3Parser.PLUS:
-            result = lhs + rhs
-        elif operator == qasm3Parser.MINUS:
-            result = lhs - rhs
-        else:
-            msg = f"Unknown operator: {ctx.getChild(1).symbol.text}"
+        function = _BINARY_OPERATORS.get(_token_type(ctx, 1))
+        if function is None:
+            msg = f"Unknown operator: {ctx.getChild(1).getText()}"
             raise NotImplementedError(msg)
-        result.ctx = ctx
-        return result
+        return function(lhs, rhs)
+
+
+# Fast path for straight-line programs made of includes, qubit register
+# declarations and calls to the supported gates with literal indices,
+# which are parsed with regular expressions instead of ANTLR. Anything
+# else, including programs for which the full parser would raise an
+# error, makes `_try_fast_parse` return None, and the program is then
+# parsed by ANTLR.
+
+_WS = r"[ \t\r\n]"
+_IDENTIFIER = r"[A-Za-z_][A-Za-z0-9_]*"
+_OPERAND = rf"{_IDENTIFIER}(?:{_WS}*\[{_WS}*[0-9]+{_WS}*\])?"
+
+_FAST_VERSION = re.compile(rf"{_WS}*OPENQASM{_WS}+[0-9]+(?:\.[0-9]+)?{_WS}*;", re.ASCII)
+
+_FAST_STATEMENT = re.compile(
+    rf"""{_WS}*(?:
+        include{_WS}*"[^"\r\t\n]+"
+        | qreg{_WS}+(?P<qreg>{_IDENTIFIER})(?:{_WS}*\[{_WS}*(?P<qreg_size>[0-9]+){_WS}*\])?
+        | qubit(?:{_WS}*\[{_WS}*(?P<qubit_size>[0-9]+){_WS}*\])?{_WS}+(?P<qubit>{_IDENTIFIER})
+        | (?P<gate>{_IDENTIFIER})
+          (?:{_WS}*\((?P<parameter>[^;]*?)\){_WS}*|{_WS}+)
+          (?P<operands>{_OPERAND}(?:{_WS}*,{_WS}*{_OPERAND})*)
+    ){_WS}*;""",
+    re.ASCII | re.VERBOSE,
+)
+
+_FAST_OPERAND = re.compile(rf"({_IDENTIFIER})(?:{_WS}*\[{_WS}*([0-9]+){_WS}*\])?", re.ASCII)
+
+# Parameters are evaluated as Python expressions: characters are
+# restricted so that only literals and operators with the same meaning in
+# Python and OpenQASM can occur.
+_FAST_PARAMETER = re.compile(r"[0-9.eE+\-*/%() \tpiπ]*")
+
+_FAST_BINARY_OPERATORS: dict[type[ast.operator], Callable[[Any, Any], int | float]] = {
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+}
+
+
+class _FastParseUnsupportedError(Exception):
+    """Raised when a program is not supported by the fast path."""
+
+
+@functools.lru_cache(maxsize=256)
+def _is_identifier(name: str) -> bool:
+    """Return `True` if `name` is lexed as an identifier and not as a keyword."""
+    tokens = qasm3Lexer(InputStream(name)).getAllTokens()
+    return len(tokens) == 1 and tokens[0].type == qasm3Parser.Identifier
+
+
+def _fast_evaluate(node: ast.expr) -> int | float:
+    if isinstance(node, ast.Constant) and type(node.value) in {int, float}:
+        return node.value  # type: ignore[return-value]
+    if isinstance(node, ast.Name) and node.id in {"pi", "π"}:
+        return math.pi
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return -_fast_evaluate(node.operand)
+    if isinstance(node, ast.BinOp) and (function := _FAST_BINARY_OPERATORS.get(type(node.op))):
+        return function(_fast_evaluate(node.left), _fast_evaluate(node.right))
+    raise _FastParseUnsupportedError
+
+
+def _fast_parameter(text: str) -> int | float:
+    if not _FAST_PARAMETER.fullmatch(text):
+        raise _FastParseUnsupportedError
+    # Both `ast.parse` and `_fast_evaluate` are recursive: long expressions
+    # are left to the full parser, which evaluates them with explicit stacks.
+    try:
+        expression = ast.parse(text.strip(), mode="eval")
+        return _fast_evaluate(expression.body)
+    except (SyntaxError, RecursionError, MemoryError):
+        raise _FastParseUnsupportedError from None
+
+
+def _fast_declare(registers: dict[str, tuple[int, int | None]], width: int, name: str, size: str | None) -> int:
+    # `pi` could be declared as a register, but is then no longer usable
+    # as a constant: leave this case to the full parser.
+    if name == "pi" or not _is_identifier(name):
+        raise _FastParseUnsupportedError
+    if size is None:
+        registers[name] = (width, None)
+        return width + 1
+    registers[name] = (width, int(size))
+    return width + int(size)
+
+
+def _fast_operand(registers: dict[str, tuple[int, int | None]], name: str, index: str) -> int:
+    # `index` is empty if the operand is not indexed
+    register = registers.get(name)
+    if register is None:
+        raise _FastParseUnsupportedError
+    start, size = register
+    if not index:
+        if size is not None:
+            raise _FastParseUnsupportedError
+        return start
+    if size is None or int(index) >= size:
+        raise _FastParseUnsupportedError
+    return start + int(index)
+
+
+def _fast_gate_call(registers: dict[str, tuple[int, int | None]], match: re.Match[str]) -> Instruction:
+    gate = match["gate"]
+    operands = [_fast_operand(registers, name, index) for name, index in _FAST_OPERAND.findall(match["operands"])]
+    parameter = match["parameter"]
+    exprs = [] if parameter is None else [_fast_parameter(parameter)]
+    try:
+        instruction = _build_instruction(gate, operands, exprs)
+    except ValueError:
+        # Wrong number of operands or parameters
+        raise _FastParseUnsupportedError from None
+    if instruction is None:
+        raise _FastParseUnsupportedError
+    return instruction
+
+
+def _try_fast_parse(s: str) -> Circuit | None:
+    """Parse `s` without ANTLR if it is a straight-line program, or return `None`."""
+    registers: dict[str, tuple[int, int | None]] = {}
+    width = 0
+    instructions: list[Instruction] = []
+    version = _FAST_VERSION.match(s)
+    position = version.end() if version else 0
+    try:
+        while match := _FAST_STATEMENT.match(s, position):
+            position = match.end()
+            if qreg := match["qreg"]:
+                width = _fast_declare(registers, width, qreg, match["qreg_size"])
+            elif qubit := match["qubit"]:
+                width = _fast_declare(registers, width, qubit, match["qubit_size"])
+            elif match["gate"]:
+                instructions.append(_fast_gate_call(registers, match))
+    except _FastParseUnsupportedError:
+        return None
+    if s[position:].strip(" \t\r\n"):
+        return None
+    return Circuit(width, instr=instructions)
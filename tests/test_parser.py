@@ -1,22 +1,34 @@
 """Tests for Graphix QASM parser."""
 
 import math
+from collections.abc import Callable
+from pathlib import Path
 
 import pytest
-from graphix.instruction import CCX, CNOT, RX, RY, RZ, RZZ, SWAP, H, S, X, Y, Z
+from antlr4 import InputStream
+from graphix import Circuit
+from graphix.instruction import CCX, CNOT, RX, RY, RZ, RZZ, SWAP, H, Instruction, S, X, Y, Z
 
 from graphix_qasm_parser import OpenQASMParser
+from graphix_qasm_parser.parser import _try_fast_parse
 
+# Entry points that parse a string, for tests that must pass with each of them
+PARSE_FUNCTIONS = [
+    pytest.param(lambda s: OpenQASMParser().parse_str(s), id="parse_str"),
+    pytest.param(lambda s: OpenQASMParser().parse_stream(InputStream(s)), id="parse_stream"),
+    pytest.param(lambda s: OpenQASMParser().parse_stream_unbuffered(InputStream(s)), id="parse_stream_unbuffered"),
+]
 
-def test_parse_simple_circuit() -> None:
+
+@pytest.mark.parametrize("parse", PARSE_FUNCTIONS)
+def test_parse_simple_circuit(parse: Callable[[str], Circuit]) -> None:
     """Test parse simple circuit."""
     s = """
 include "qelib1.inc";
 qubit q;
 rz(5*pi/4) q;
 """
-    parser = OpenQASMParser()
-    circuit = parser.parse_str(s)
+    circuit = parse(s)
     assert circuit.width == 1
     assert len(circuit.instruction) == 1
     instruction = circuit.instruction[0]
@@ -24,15 +36,15 @@ rz(5*pi/4) q;
     assert math.isclose(instruction.angle, 5 * math.pi / 4)
 
 
-def test_parse_simple_circuit_old_syntax() -> None:
+@pytest.mark.parametrize("parse", PARSE_FUNCTIONS)
+def test_parse_simple_circuit_old_syntax(parse: Callable[[str], Circuit]) -> None:
     """Test parse simple circuit."""
     s = """
 include "qelib1.inc";
 qreg q;
 rz(5*pi/4) q;
 """
-    parser = OpenQASMParser()
-    circuit = parser.parse_str(s)
+    circuit = parse(s)
     assert circuit.width == 1
     assert len(circuit.instruction) == 1
     instruction = circuit.instruction[0]
@@ -40,7 +52,8 @@ rz(5*pi/4) q;
     assert math.isclose(instruction.angle, 5 * math.pi / 4)
 
 
-def test_parse_all_instructions() -> None:  # noqa: PLR0915
+@pytest.mark.parametrize("parse", PARSE_FUNCTIONS)
+def test_parse_all_instructions(parse: Callable[[str], Circuit]) -> None:
     """Test parse all instructions."""
     s = """
 include "qelib1.inc";
@@ -58,8 +71,7 @@ rx(pi/4) q[0];
 ry(pi/4) q[0];
 rz(pi/4) q[0];
 """
-    parser = OpenQASMParser()
-    circuit = parser.parse_str(s)
+    circuit = parse(s)
     assert circuit.width == 3
     iterator = iter(circuit.instruction)
     instruction = next(iterator)
@@ -109,7 +121,8 @@ rz(pi/4) q[0];
         next(iterator)
 
 
-def test_parse_all_expressions() -> None:
+@pytest.mark.parametrize("parse", PARSE_FUNCTIONS)
+def test_parse_all_expressions(parse: Callable[[str], Circuit]) -> None:
     """Test parse all expressions."""
     s = """
 include "qelib1.inc";
@@ -125,8 +138,7 @@ rz(1 - (2 + 3)) q;
 rz(pi) q;
 rz(π) q;
 """
-    parser = OpenQASMParser()
-    circuit = parser.parse_str(s)
+    circuit = parse(s)
     assert circuit.width == 1
     iterator = iter(circuit.instruction)
     instruction = next(iterator)
@@ -181,3 +193,220 @@ rz(alpha) q[0];
     assert math.isclose(instruction.angle, math.pi / 4)
     with pytest.raises(StopIteration):
         next(iterator)
+
+
+def test_non_integer_register_size() -> None:
+    """Test that register sizes must be integers."""
+    s = """
+include "qelib1.inc";
+qubit[pi] q;
+"""
+    parser = OpenQASMParser()
+    with pytest.raises(TypeError):
+        parser.parse_str(s)
+
+
+def test_parse_file(tmp_path: Path) -> None:
+    """Test parse file."""
+    path = tmp_path / "circuit.qasm"
+    path.write_text(
+        """
+include "qelib1.inc";
+qubit q;
+rz(π/2) q;
+""",
+        encoding="utf-8",
+    )
+    parser = OpenQASMParser()
+    circuit = parser.parse_file(path)
+    assert circuit.width == 1
+    assert len(circuit.instruction) == 1
+    instruction = circuit.instruction[0]
+    assert isinstance(instruction, RZ)
+    assert math.isclose(instruction.angle, math.pi / 2)
+
+
+@pytest.mark.parametrize(
+    ("s", "width", "instructions"),
+    [
+        (
+            """
+include "qelib1.inc";
+qubit[2] q;
+h q[0];
+x q[0] q[1];
+z q[1];
+""",
+            2,
+            [H(0), X(0), Z(1)],
+        ),
+        # Statements with a missing identifier
+        ("qubit[2] ;\nh q[0];", 2, []),
+        ("qreg [2];", 2, []),
+        ("const int = 3;", 0, []),
+    ],
+)
+@pytest.mark.parametrize("parse", PARSE_FUNCTIONS)
+def test_syntax_error_recovery(
+    parse: Callable[[str], Circuit],
+    s: str,
+    width: int,
+    instructions: list[Instruction],
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    """Test that parsing recovers from syntax errors."""
+    circuit = parse(s)
+    assert circuit.width == width
+    assert circuit.instruction == instructions
+    # Syntax errors are reported
+    assert capsys.readouterr().err
+
+
+@pytest.mark.parametrize("parse", PARSE_FUNCTIONS)
+def test_lexer_errors_reported_once(parse: Callable[[str], Circuit], capsys: pytest.CaptureFixture[str]) -> None:
+    """Test that lexer errors are reported once when parsing falls back to LL prediction."""
+    s = """
+include "qelib1.inc";
+qubit[2] q;
+#
+h q[0];
+rz(pi q[1];
+"""
+    circuit = parse(s)
+    assert circuit.instruction == [H(0)]
+    assert capsys.readouterr().err.count("token recognition error") == 1
+
+
+def test_parse_large_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that large files are parsed without buffering tokens."""
+
+    def parse_stream(_self: OpenQASMParser, _stream: InputStream) -> Circuit:
+        msg = "parse_stream should not be called"
+        raise AssertionError(msg)
+
+    monkeypatch.setattr(OpenQASMParser, "parse_stream", parse_stream)
+    path = tmp_path / "circuit.qasm"
+    path.write_text(
+        """
+include "qelib1.inc";
+qubit[2] q;
+h q[0];
+x q[0] q[1];
+rz(-(π / 2) + 1) q[1];
+""",
+        encoding="utf-8",
+    )
+    parser = OpenQASMParser(unbuffered_threshold=0)
+    circuit = parser.parse_file(path)
+    assert circuit.width == 2
+    iterator = iter(circuit.instruction)
+    instruction = next(iterator)
+    assert isinstance(instruction, H)
+    assert instruction.target == 0
+    instruction = next(iterator)
+    assert isinstance(instruction, X)
+    assert instruction.target == 0
+    instruction = next(iterator)
+    assert isinstance(instruction, RZ)
+    assert instruction.target == 1
+    assert math.isclose(instruction.angle, -(math.pi / 2) + 1)
+    with pytest.raises(StopIteration):
+        next(iterator)
+
+
+def test_index_out_of_bounds() -> None:
+    """Test that out-of-bounds indices are rejected."""
+    s = """
+include "qelib1.inc";
+qubit[2] q;
+h q[2];
+"""
+    parser = OpenQASMParser()
+    with pytest.raises(IndexError, match="Index out of bounds"):
+        parser.parse_str(s)
+
+
+def test_wrong_operand_count() -> None:
+    """Test that gates applied to the wrong number of operands are rejected."""
+    s = """
+include "qelib1.inc";
+qubit[2] q;
+h q[0], q[1];
+"""
+    parser = OpenQASMParser()
+    with pytest.raises(ValueError, match="Gate h expects 1 operands, got 2"):
+        parser.parse_str(s)
+
+
+def test_parse_stream_unbuffered() -> None:
+    """Test parse stream without buffering tokens."""
+    s = """
+include "qelib1.inc";
+qubit[2] q;
+h q[0];
+cx q[0], q[1];
+rz(-(pi / 2) + 1) q[1];
+"""
+    parser = OpenQASMParser()
+    circuit = parser.parse_stream_unbuffered(InputStream(s))
+    assert circuit.width == 2
+    iterator = iter(circuit.instruction)
+    instruction = next(iterator)
+    assert isinstance(instruction, H)
+    assert instruction.target == 0
+    instruction = next(iterator)
+    assert isinstance(instruction, CNOT)
+    assert instruction.target == 1
+    assert instruction.control == 0
+    instruction = next(iterator)
+    assert isinstance(instruction, RZ)
+    assert instruction.target == 1
+    assert math.isclose(instruction.angle, -(math.pi / 2) + 1)
+    with pytest.raises(StopIteration):
+        next(iterator)
+
+
+@pytest.mark.parametrize(
+    ("s", "fast"),
+    [
+        (
+            """
+OPENQASM 2.0;
+include "qelib1.inc";
+qreg q[3];
+qubit r;
+ccx q[0], q[1], q[2];
+crz(pi/3) q[0], r;
+rz(-(5 * pi) / 4 % 2) q[2];
+swap q[1],r;
+""",
+            True,
+        ),
+        # Comments and non-literal indices are not handled by the fast path
+        (
+            """
+include "qelib1.inc";
+qubit[2] q; // comment
+rz(0.5) q[1 + 0];
+""",
+            False,
+        ),
+        # Too deep for the recursive evaluation of the fast path
+        (
+            f"""
+include "qelib1.inc";
+qubit q;
+rz({"+".join(["1"] * 3000)}) q;
+""",
+            False,
+        ),
+    ],
+)
+def test_parse_str_matches_parse_stream(s: str, *, fast: bool) -> None:
+    """Test that parse_str and parse_stream give the same circuit."""
+    assert (_try_fast_parse(s) is not None) == fast
+    parser = OpenQASMParser()
+    circuit = parser.parse_str(s)
+    reference = parser.parse_stream(InputStream(s))
+    assert circuit.width == reference.width
+    assert circuit.instruction == reference.instruction